@@ -1,10 +1,18 @@
 import multiprocessing
 import os
+import shutil
+import sys
 from time import perf_counter
 from functools import wraps
 
+import numpy as np
+from numba import njit
+
 BOARD_SIZE = 8
-FORMAT_SIZE = len(str(BOARD_SIZE ** 2))
+SQUARE_COUNT = BOARD_SIZE ** 2  # Numba freezes module globals, so solve is compiled with this as a literal
+if SQUARE_COUNT > 64:
+    raise ValueError("BOARD_SIZE must be at most 8: the solver tracks occupancy in a 64-bit mask")
+FORMAT_SIZE = len(str(SQUARE_COUNT))
 BLANK = ("-" * FORMAT_SIZE)
 
 def memoize(f):
@@ -20,39 +28,21 @@ def memoize(f):
         return cache[a]
     return wrapper
 
-@memoize
-def getNotationDicts(size: int) -> tuple:
-    """
-    Returns dictionaries for converting between chess notation and array indices\n
-    Uses board size to determine the number of rows and columns
-    """
-    int_to_abc = {}
-    rows_to_ranks = {}
-    columns_to_files = {}
-
-    for i in range(26*2):
-        int_to_abc[i] = chr(97+i) if i < 26 else chr(39+i)
+# Chess notation lookups: files are lettered from a, ranks count up from the bottom row
+COLS = tuple(chr(97+i) for i in range(BOARD_SIZE))
+RANKS = tuple(str(BOARD_SIZE-i) for i in range(BOARD_SIZE))
 
-    for i in range(size):
-        rows_to_ranks[i] = str(size-i)
-        columns_to_files[i] = int_to_abc[i]
-
-    return rows_to_ranks, columns_to_files
-
-@memoize
 def getChessNotation(point: tuple) -> str:
     """
     Converts a point on the board to chess notation
     """
-    rows_to_ranks, columns_to_files = getNotationDicts(BOARD_SIZE)
-
-    return columns_to_files[point[1]] + rows_to_ranks[point[0]]
+    return COLS[point[1]] + RANKS[point[0]]
 
 @memoize
-def getKnightMoves(point: tuple):
+def getKnightMoves(point: tuple) -> tuple:
     """
-    Returns a list of valid knight moves from a given point\n
-    (Does not check if spaces are occupied)
+    Returns a tuple of valid knight moves from a given point\n
+    (Does not check if spaces are occupied, and is immutable since results are memoized)
     """
     valid_positions = []
     knight_moves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
@@ -62,71 +52,209 @@ def getKnightMoves(point: tuple):
         if 0 <= end_row <= (BOARD_SIZE - 1)  and 0 <= end_column <= (BOARD_SIZE - 1):
             valid_positions.append((end_row, end_column))
             
-    return valid_positions
+    return tuple(valid_positions)
+
+# Knight moves from each square, with squares indexed as row * BOARD_SIZE + column
+NEIGHBORS = tuple(
+    tuple(r * BOARD_SIZE + c for r, c in getKnightMoves((sq // BOARD_SIZE, sq % BOARD_SIZE)))
+    for sq in range(SQUARE_COUNT)
+)
+
+# Warnsdorff's rule heuristic: neighbors of each square ordered by their number of possible subsequent moves
+NEIGHBORS_SORTED = tuple(
+    tuple(sorted(NEIGHBORS[sq], key=lambda n: len(NEIGHBORS[n])))
+    for sq in range(SQUARE_COUNT)
+)
+
+# NEIGHBORS_SORTED as arrays for the compiled solver, with each row padded with -1 up to the maximum of 8 moves
+NEIGHBOR_TABLE = np.full((SQUARE_COUNT, 8), -1, dtype=np.int8)
+NEIGHBOR_COUNTS = np.zeros(SQUARE_COUNT, dtype=np.int8)
+for sq, moves in enumerate(NEIGHBORS_SORTED):
+    NEIGHBOR_TABLE[sq, :len(moves)] = moves
+    NEIGHBOR_COUNTS[sq] = len(moves)
+
+# Bitmask of the knight moves from each square, for counting unvisited onward moves against the occupancy mask
+NEIGHBOR_MASKS = np.zeros(SQUARE_COUNT, dtype=np.uint64)
+for sq, moves in enumerate(NEIGHBORS):
+    NEIGHBOR_MASKS[sq] = sum(1 << n for n in moves)
+
+# The 8 symmetries of the board (rotations and reflections), each as a permutation of square indices
+# Applying one to every square of a tour gives a tour for the mapped starting square
+SYMMETRIES = tuple(
+    tuple(r * BOARD_SIZE + c for r, c in (transform(sq // BOARD_SIZE, sq % BOARD_SIZE) for sq in range(SQUARE_COUNT)))
+    for transform in (
+        lambda r, c: (r, c),
+        lambda r, c: (c, BOARD_SIZE - 1 - r),
+        lambda r, c: (BOARD_SIZE - 1 - r, BOARD_SIZE - 1 - c),
+        lambda r, c: (BOARD_SIZE - 1 - c, r),
+        lambda r, c: (r, BOARD_SIZE - 1 - c),
+        lambda r, c: (BOARD_SIZE - 1 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (BOARD_SIZE - 1 - c, BOARD_SIZE - 1 - r),
+    )
+)
+
+def writeSolution(path) -> None:
+    """
+    Writes the tour given by a path of square indices to the solution file for its starting point
+    """
+    start_point = (path[0] // BOARD_SIZE, path[0] % BOARD_SIZE)
+
+    # Rebuild the board of step numbers from the path (0 for unvisited squares)
+    board = [[0 for _0 in range(BOARD_SIZE)] for _1 in range(BOARD_SIZE)]
+    for i, square in enumerate(path):
+        board[square // BOARD_SIZE][square % BOARD_SIZE] = i+1
+
+    # Format the step numbers and build the whole file in memory to write it at once (each row keeps its trailing space)
+    header = f"Knight's Tour output for starting point {getChessNotation(start_point)} on a {BOARD_SIZE}x{BOARD_SIZE} board:\n\n"
+    body = "".join(" ".join(f"{n:0{FORMAT_SIZE}d}" if n else BLANK for n in line) + " \n" for line in board)
 
-def process_handler(start_point: tuple, lock: multiprocessing.Lock):
+    with open((f"solutions/{getChessNotation(start_point)}.txt"), "w") as file:
+        file.write(header + body)
+
+def process_handler(start_point: tuple) -> tuple:
+    """
+    Solves the tour for a single starting point in a pool worker, and writes it along with its mirror images
+    for every other starting point in the same symmetry class\n
+    Returns the starting points of the symmetry class (the given point first) and the time taken in ms to solve and
+    write all of their files (None if no solution was found) for the main process to report
+    """
     start_time = perf_counter()
-    step = 1
-
-    # Create a blank board and mark the starting point
-    board = [[BLANK for _0 in range(BOARD_SIZE)] for _1 in range(BOARD_SIZE)]
-    board[start_point[0]][start_point[1]] = f"{step:0{FORMAT_SIZE}d}"
-
-    if solve(board, start_point, step+1): # Solution found
-        # Write solution to file
-        with open((f"solutions/{getChessNotation(start_point)}.txt"), "w") as file:
-            file.write(f"Knight's Tour output for starting point {getChessNotation(start_point)} on a {BOARD_SIZE}x{BOARD_SIZE} board:\n\n")
-            for line in board:
-                for item in line:
-                    file.write(item + " ")
-                file.write("\n")
+
+    start_square = start_point[0] * BOARD_SIZE + start_point[1]
+    path = np.zeros(SQUARE_COUNT, dtype=np.int8)
+
+    # Each distinct starting point the symmetries map to, in order (the identity comes first)
+    orbit_squares = list(dict.fromkeys(symmetry[start_square] for symmetry in SYMMETRIES))
+    orbit_points = [(square // BOARD_SIZE, square % BOARD_SIZE) for square in orbit_squares]
+
+    if solve(start_square, path, NEIGHBOR_TABLE, NEIGHBOR_COUNTS, NEIGHBOR_MASKS): # Solution found
+        # Write solution to file for each starting point in the symmetry class
+        written = set()
+        for symmetry in SYMMETRIES:
+            mapped_path = [symmetry[square] for square in path]
+            if mapped_path[0] not in written:
+                written.add(mapped_path[0])
+                writeSolution(mapped_path)
     else:
-        print(f"Failed to find solution for point {getChessNotation(start_point)}.")
-        return False
+        return orbit_points, None
         
     end_time = perf_counter()
 
-    with lock:  # Print lock to prevent overlapping output
-        print(f"Process for point {getChessNotation(start_point)} took {((end_time-start_time) * 10**3):.4f} ms")
+    return orbit_points, (end_time-start_time) * 10**3
 
-def solve(board: list[list[str]], point: tuple, step: int) -> bool:
+def pinWorker(worker_counter) -> None:
     """
-    Solves the Knight's Tour problem by recursion using the current board state, a current point, and a step number.\n
-    Chooses the next point based on the number of possible moves from each point, and backtracks if no moves are possible.\n
-    When the step number reaches the number of squares on the board, the solution is complete.
+    Pool initializer that pins each worker process to its own CPU, so the kernel doesn't migrate it away from its warm cache\n
+    Workers number themselves from a shared counter created for each pool (replacement workers wrap around the CPUs)\n
+    (Only on platforms that support os.sched_setaffinity, such as Linux)
     """
-    if step == (BOARD_SIZE ** 2) + 1:   # Check if the solution is complete
-        return True                     # Return True to all higher levels
+    if hasattr(os, "sched_setaffinity"):
+        with worker_counter.get_lock():
+            worker_index = worker_counter.value
+            worker_counter.value += 1
 
-    moves = getKnightMoves(point)
+        cpus = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cpus[worker_index % len(cpus)]})
 
-    # Apply the Warnsdorff's rule heuristic and prioritize moves with the fewest possible subsequent moves
-    moves.sort(key=lambda i: len(getKnightMoves(i)))    
+@njit('uint64(uint64)', cache=True)
+def popcount(x):
+    """
+    Counts the set bits of a 64-bit mask, summing bits in parallel within the register (SWAR)
+    """
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
 
-    for move in moves:
-        if board[move[0]][move[1]] == BLANK:                    # Check if the space is occupied
-            board[move[0]][move[1]] = f"{step:0{FORMAT_SIZE}d}" # Mark the board with the current step number
-            if solve(board, move, step+1):                      # Solution found on lower level
-                return True                                     # Continue returning True to all higher levels
-            board[move[0]][move[1]] = BLANK                     # Backtrack
-    return False                                                # No solution found
+@njit('int64(int64, uint64, int8[:,:], int8[:], uint64[:], int8[:,:], int64, int64[:])', cache=True)
+def orderMoves(square, mask, neighbors, neighbor_counts, neighbor_masks, order, depth, degrees):
+    """
+    Fills order[depth] with the unvisited neighbors of a square and returns how many there are\n
+    Applies Warnsdorff's rule by insertion sorting them on their number of unvisited onward moves,
+    with ties keeping the static ordering of NEIGHBOR_TABLE (degrees is scratch space for the sort keys)
+    """
+    count = 0
+    for i in range(neighbor_counts[square]):
+        move = neighbors[square, i]
+        if mask & (np.uint64(1) << np.uint64(move)):   # Skip occupied spaces
+            continue
+
+        degree = np.int64(popcount(neighbor_masks[move] & ~mask))
+        j = count
+        while j > 0 and degrees[j-1] > degree:
+            degrees[j] = degrees[j-1]
+            order[depth, j] = order[depth, j-1]
+            j -= 1
+        degrees[j] = degree
+        order[depth, j] = move
+        count += 1
+    return count
+
+@njit('boolean(int64, int8[:], int8[:,:], int8[:], uint64[:])', cache=True)
+def solve(start_square, path, neighbors, neighbor_counts, neighbor_masks):
+    """
+    Solves the Knight's Tour problem from a starting square using an explicit stack instead of recursion.\n
+    Chooses the next square based on the number of unvisited moves from each candidate square (see orderMoves), and backtracks if no moves are possible.\n
+    The path array records the square visited at each step and doubles as the stack; when it is full, the solution is complete.\n
+    Compiled with Numba, so the occupancy mask is kept as uint64 throughout (mixing it with signed integers would promote to float).
+    """
+    order = np.empty((SQUARE_COUNT, 8), dtype=np.int8) # Candidate moves from the square at each depth, in the order to try them
+    order_counts = np.zeros(SQUARE_COUNT, dtype=np.int8)
+    tried = np.zeros(SQUARE_COUNT, dtype=np.int8)      # Number of moves already tried from the square at each depth
+    degrees = np.empty(8, dtype=np.int64)
+    path[0] = start_square
+    mask = np.uint64(1) << np.uint64(start_square)
+    depth = 0
+    order_counts[0] = orderMoves(start_square, mask, neighbors, neighbor_counts, neighbor_masks, order, 0, degrees)
+
+    while depth >= 0:
+        if depth == SQUARE_COUNT - 1:                   # Check if the solution is complete
+            return True
+
+        if tried[depth] < order_counts[depth]:          # Moves with the fewest possible subsequent moves come first
+            move = order[depth, tried[depth]]
+            tried[depth] += 1
+            mask |= np.uint64(1) << np.uint64(move)     # Mark the square and push it as the next step
+            depth += 1
+            path[depth] = move
+            tried[depth] = 0
+            order_counts[depth] = orderMoves(move, mask, neighbors, neighbor_counts, neighbor_masks, order, depth, degrees)
+        else:
+            mask &= ~(np.uint64(1) << np.uint64(path[depth]))  # Backtrack
+            depth -= 1
+    return False                                        # No solution found
 
 def main():
     main_start_time = perf_counter()
-    lock = multiprocessing.Lock()                               # Print lock to prevent overlapping output
 
     # Create a list of all possible starting points
     all_points = [(i, j) for j in range(BOARD_SIZE) for i in range(BOARD_SIZE)]
 
-    processes = []
-    for point in all_points:
-        processes.append(multiprocessing.Process(target=process_handler, args=(point, lock)))
+    # Only solve one point from each symmetry class (the triangle in the top left quadrant above the diagonal),
+    # the tours for the rest are mirror images written by process_handler
+    canonical_points = [p for p in all_points if p[0] <= p[1] <= (BOARD_SIZE - 1) // 2]
+
+    # Submit the hardest points first (fewest initial moves, such as corners) so they don't hold up the end of the run
+    canonical_points.sort(key=lambda p: len(getKnightMoves(p)))
 
-    for process in processes:
-        process.start()
+    # One worker per CPU this process may run on (the same set pinWorker pins to);
+    # points are handed out as workers free up, since some take far longer than others
+    if hasattr(os, "sched_getaffinity"):
+        worker_count = len(os.sched_getaffinity(0))
+    else:
+        worker_count = os.cpu_count()
 
-    for process in processes:
-        process.join()
+    worker_counter = multiprocessing.Value("i", 0)  # Numbers the workers of this pool for pinWorker
+    with multiprocessing.Pool(processes=worker_count, initializer=pinWorker, initargs=(worker_counter,)) as pool:
+        for orbit_points, elapsed_ms in pool.imap_unordered(process_handler, canonical_points):
+            if elapsed_ms is None:
+                for point in orbit_points:
+                    print(f"Failed to find solution for point {getChessNotation(point)}.")
+            else:
+                point, *mirrored_points = orbit_points
+                mirrored = f" (with symmetric points {', '.join(getChessNotation(p) for p in mirrored_points)})" if mirrored_points else ""
+                print(f"Process for point {getChessNotation(point)}{mirrored} took {elapsed_ms:.4f} ms")
 
     t_time = perf_counter()-main_start_time
     print(f"Final completion time: {t_time:.4f} Seconds\n")
@@ -143,8 +271,15 @@ def findMean(n: int) -> float:
     return (sum(times) / len(times))
 
 if __name__ == "__main__":
-    for file in os.scandir("solutions"):
-        os.remove(file.path)
+    # Forked workers inherit the lookup tables and the compiled solve (compiled eagerly at import from its signature)
+    # instead of re-importing the module; this is only done on Linux, since fork is unsafe on macOS and unavailable on Windows,
+    # so other platforms keep their default start method and load solve from Numba's cache
+    if sys.platform.startswith("linux"):
+        multiprocessing.set_start_method("fork")
+
+    # Start from an empty solutions directory (creating it if missing)
+    shutil.rmtree("solutions", ignore_errors=True)
+    os.makedirs("solutions", exist_ok=True)
     main()
 
     #print(f"\nAverage time: {findMean(100):.4f} Seconds")
\ No newline at end of file